@@ -4,19 +4,25 @@ import os
 import sys
 import re
 import logging
+import logging.handlers
 import argparse
 import json
+import sqlite3
+import struct
+import textwrap
 import time
 import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import multiprocessing
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
 from collections import Counter
-from datetime import datetime
-from typing import List, Tuple, Optional, Dict, Any, Iterable, Set
+from itertools import islice
+from datetime import datetime, timedelta
+from typing import List, Tuple, Optional, Dict, Any, BinaryIO, Callable, Iterable, Iterator, NamedTuple, Set
 import shutil
 
 # --- Library Safety Imports ---
 try:
-    from PIL import Image, ExifTags
+    from PIL import Image, ExifTags, UnidentifiedImageError
 except ImportError:
     sys.exit("CRITICAL ERROR: 'Pillow' library not found.\nPlease run: pip install Pillow")
 
@@ -47,24 +53,142 @@ DEFAULT_IGNORED_FILES = {'SYNOFILE_THUMB', 'desktop.ini', '.DS_Store', 'Thumbs.d
 DEFAULT_IGNORED_EXT = {'.db', '.tmp', '.ini', '.txt', '.log', '.json', '.sh', '.py', '.ps1'}
 
 INVALID_FILENAME_CHARS = r'[<>:"/\\|?*]'
+_RE_INVALID_CHARS = re.compile(INVALID_FILENAME_CHARS)
+_RE_LEAD_NUM = re.compile(r"^[\d\.\-\/\s]+")  # Old date/number prefix stripped from folder names
+_RE_ISO_PREFIX = re.compile(r"^\d{4}-\d{2}-\d{2}")  # Folder already carries our "YYYY-MM-DD ..." prefix
 IMAGE_EXT = frozenset({'.jpg', '.jpeg', '.png', '.tiff', '.heic'})
 VIDEO_EXT = frozenset({'.mp4', '.mov', '.avi', '.mkv', '.3gp', '.m4v'})
+MEDIA_EXT = IMAGE_EXT | VIDEO_EXT
+JPEG_EXT = frozenset({'.jpg', '.jpeg'})  # Parsed directly, without Pillow
+HEIC_EXT = frozenset({'.heic'})  # Read through pillow_heif.open_heif, without Pillow's opener
+ISOBMFF_EXT = frozenset({'.mp4', '.mov', '.3gp', '.m4v'})  # Parsed directly, without hachoir
+MP4_EPOCH = datetime(1904, 1, 1)  # mvhd timestamps count seconds from here
+
+# EXIF tags
+TAG_DATETIME_ORIGINAL = 0x9003  # 36867, in the Exif sub-IFD
+TAG_DATETIME = 0x0132           # 306, in IFD0
+TAG_EXIF_IFD = 0x8769           # Pointer from IFD0 to the Exif sub-IFD
 
 # --- TUNING KNOBS ---
 SAMPLE_SIZE = 50       # Scan max 50 fail per folder
 MIN_YEAR = 2000        # Tarikh bawah 2000 dianggap error (Unix epoch/Bad battery)
 MAX_YEAR = datetime.now().year + 1 
+DECODE_CHUNKSIZE = 4   # Files per IPC round-trip to the decode process pool
+WRITE_BUFFER = 1 << 20 # 1MB buffer for report/undo files: few large writes instead of many small ones
+SCAN_BATCH = 16        # Files decoded per round before checking whether the folder is already decided
 
 logger = logging.getLogger(__name__)
 
 # ==========================================
 # MODULE 1: METADATA SCANNER
 # ==========================================
+def _file_ext(name: str) -> str:
+    """Lower-cased extension of a bare file name, like os.path.splitext(name)[1].lower() but cheaper."""
+    dot = name.rfind('.')
+    return name[dot:].lower() if dot > 0 else ''
+
+def _read_jpeg_exif(filepath: str) -> Optional[bytes]:
+    """Returns the TIFF block of the APP1 'Exif' segment, or None if the JPEG has none.
+    Raises ValueError if the marker structure cannot be walked."""
+    with open(filepath, 'rb') as f:
+        if f.read(2) != b'\xff\xd8': raise ValueError("Missing SOI marker")
+        while True:
+            header = f.read(4)
+            if len(header) < 4 or header[0] != 0xFF: raise ValueError("Bad JPEG marker")
+            marker, seg_len = header[1], struct.unpack('>H', header[2:])[0]
+            if marker in (0xD9, 0xDA): return None  # EOI / start of image data: no EXIF ahead
+            if seg_len < 2: raise ValueError("Bad JPEG segment length")
+            if marker == 0xE1:
+                data = f.read(seg_len - 2)
+                if data[:6] == b'Exif\x00\x00': return data[6:]
+            else:
+                f.seek(seg_len - 2, os.SEEK_CUR)
+
+# IFD entry: tag, type, count, value-or-offset (per byte order)
+_IFD_ENTRY = {'<': struct.Struct('<HHI4s'), '>': struct.Struct('>HHI4s')}
+
+def _find_tiff_date(tiff: bytes) -> Optional[str]:
+    """Walks IFD0 and the Exif sub-IFD of a TIFF block for DateTimeOriginal, then DateTime
+    (also used when DateTimeOriginal is blank or unparseable, e.g. "    :  :     ")."""
+    if tiff[:2] == b'II': endian = '<'
+    elif tiff[:2] == b'MM': endian = '>'
+    else: raise ValueError("Bad TIFF byte order")
+
+    entry = _IFD_ENTRY[endian]
+
+    def ifd_entries(offset: int) -> Iterator[Tuple[int, int, int, bytes]]:
+        # One C-level iterator over the whole 12-byte entry table instead of an unpack_from per entry
+        count = struct.unpack_from(endian + 'H', tiff, offset)[0]
+        start = offset + 2
+        return entry.iter_unpack(memoryview(tiff)[start:start + 12 * count])
+
+    def ascii_value(count: int, value: bytes) -> str:
+        if count > 4:
+            start = struct.unpack(endian + 'I', value)[0]
+            value = tiff[start:start + count]
+        return value[:count].split(b'\x00', 1)[0].decode('ascii', 'replace')
+
+    date_time = None
+    exif_ifd = None
+    for tag, typ, count, value in ifd_entries(struct.unpack_from(endian + 'I', tiff, 4)[0]):
+        if tag == TAG_DATETIME and typ == 2: date_time = ascii_value(count, value)
+        elif tag == TAG_EXIF_IFD: exif_ifd = struct.unpack(endian + 'I', value)[0]
+
+    if exif_ifd:
+        for tag, typ, count, value in ifd_entries(exif_ifd):
+            if tag == TAG_DATETIME_ORIGINAL and typ == 2:
+                original = ascii_value(count, value)
+                if MetadataScanner._parse_date(original): return original
+                break
+    return date_time
+
+def _read_exact(f: BinaryIO, n: int) -> bytes:
+    data = f.read(n)
+    if len(data) < n: raise ValueError("Truncated box")  # e.g. interrupted recording
+    return data
+
+def _read_mvhd_creation(filepath: str) -> Optional[datetime]:
+    """Returns moov/mvhd creation_time of an MP4/MOV file, or None if it is unset (0).
+    Raises ValueError if no mvhd box can be found."""
+    with open(filepath, 'rb') as f:
+        limit = f.seek(0, os.SEEK_END)
+        pos = 0
+        while pos + 8 <= limit:
+            f.seek(pos)
+            size, box = struct.unpack('>I4s', _read_exact(f, 8))
+            header = 8
+            if size == 1:  # 64-bit largesize follows the type
+                size = struct.unpack('>Q', _read_exact(f, 8))[0]
+                header = 16
+            elif size == 0:  # Box runs to the end of its parent
+                size = limit - pos
+            if size < header: raise ValueError("Bad box size")
+
+            if box == b'moov':
+                pos, limit = pos + header, pos + size  # Descend into moov
+                continue
+            if box == b'mvhd':
+                version = _read_exact(f, 4)[0]  # version (1 byte) + flags (3 bytes)
+                if version == 1: seconds = struct.unpack('>Q', _read_exact(f, 8))[0]
+                else: seconds = struct.unpack('>I', _read_exact(f, 4))[0]
+                return MP4_EPOCH + timedelta(seconds=seconds) if seconds else None
+            pos += size
+    raise ValueError("mvhd box not found")
+
+class MissingDependency(Exception):
+    """Raised by an extractor whose optional library (hachoir, pillow-heif) is not installed."""
+
 class MetadataScanner:
-    def __init__(self, ignored_dirs: Set[str], ignored_files: Set[str], ignored_ext: Set[str]):
+    def __init__(self, ignored_dirs: Set[str], ignored_files: Set[str], ignored_ext: Set[str],
+                 pool: Optional[Executor] = None, cache: Optional['DateCache'] = None,
+                 min_confidence: float = 0.0):
         self.ignored_dirs = ignored_dirs
         self.ignored_files = ignored_files
         self.ignored_ext = ignored_ext
+        self.pool = pool  # Optional process pool for decoding; None = decode in calling thread
+        self.cache = cache
+        self.walk_pool: Optional[Executor] = None  # Optional thread pool for listing subdirectories
+        self.min_confidence = min_confidence  # Lets scan_folder stop once the verdict is fixed
 
     def scan_folder(self, folder_path: str) -> Tuple[Counter, int]:
         date_counter = Counter()
@@ -73,18 +197,15 @@ class MetadataScanner:
         images = []
         videos = []
         
-        for dirpath, dirnames, filenames in os.walk(folder_path):
-            # Help linter understand dirnames is a list that can be modified in-place
-            valid_dirs = [d for d in dirnames if d not in self.ignored_dirs]
-            dirnames.clear()
-            dirnames.extend(valid_dirs)
-            for f in filenames:
-                if any(i in f for i in self.ignored_files): continue
-                ext = os.path.splitext(f)[1].lower()
-                if ext in self.ignored_ext: continue
-                
-                if ext in IMAGE_EXT: images.append(os.path.join(dirpath, f))
-                elif ext in VIDEO_EXT: videos.append(os.path.join(dirpath, f))
+        for entry in self._scan(folder_path):
+            f = entry.name
+            ext = _file_ext(f)
+            if ext not in MEDIA_EXT: continue  # Cheap pre-filter before the per-name checks below
+            if ext in self.ignored_ext: continue
+            if any(i in f for i in self.ignored_files): continue
+            
+            if ext in IMAGE_EXT: images.append(entry)
+            elif ext in VIDEO_EXT: videos.append(entry)
 
         files_found = images + videos
 
@@ -92,35 +213,177 @@ class MetadataScanner:
 
         scanned_count: int = 0
         valid_dates_found: int = 0
+        files_iter = iter(files_found)
         
-        for filepath in files_found:
-            if valid_dates_found >= SAMPLE_SIZE: break
-                
-            date_obj = self._get_date(filepath)
-            scanned_count = scanned_count + 1
-            if date_obj:
-                date_counter[date_obj.strftime("%Y-%m-%d")] += 1
-                valid_dates_found = valid_dates_found + 1  # type: ignore[operator]
+        while valid_dates_found < SAMPLE_SIZE:
+            # Dispatch only as many files as we still need dates for, in rounds of SCAN_BATCH
+            batch = list(islice(files_iter, min(SCAN_BATCH, SAMPLE_SIZE - valid_dates_found)))
+            if not batch: break
+
+            for _, date_str, _ in self._extract_batch(batch):
+                scanned_count = scanned_count + 1
+                if date_str:
+                    date_counter[date_str] += 1
+                    valid_dates_found = valid_dates_found + 1  # type: ignore[operator]
+                    if valid_dates_found >= SAMPLE_SIZE: break
+
+            if self._is_decided(date_counter, scanned_count, valid_dates_found,
+                                len(files_found) - scanned_count): break
                 
         return date_counter, scanned_count
 
-    def _get_date(self, filepath: str) -> Optional[datetime]:
-        ext = os.path.splitext(filepath)[1].lower()
-        if ext in IMAGE_EXT: return self._get_image_date(filepath)
-        elif ext in VIDEO_EXT: return self._get_video_date(filepath)
-        return None
+    def _is_decided(self, counter: Counter, scanned: int, valid: int, remaining: int) -> bool:
+        """True once no outcome of the unscanned files can change the top date or the confidence verdict."""
+        if remaining <= 0: return False
+        ranked = counter.most_common(2)
+        top_c = ranked[0][1] if ranked else 0
+        second_c = ranked[1][1] if len(ranked) > 1 else 0
+        max_new_dates = min(remaining, SAMPLE_SIZE - valid)
+
+        # Hopeless: even if every remaining file had the top date, confidence stays too low. Needs at
+        # least one date, else the folder would be reported "Empty" while unscanned files may have dates
+        if top_c and (top_c + max_new_dates) / (scanned + max_new_dates) < self.min_confidence: return True
+        # Settled: the lead cannot be overtaken, and confidence holds even if no remaining file has a date
+        return top_c - second_c > max_new_dates and top_c / (scanned + remaining) >= self.min_confidence
+
+    def _scan(self, root: str) -> Iterator[os.DirEntry]:
+        """Top-down walk like os.walk, but yields DirEntry objects so their stat cache can be reused."""
+        if self.walk_pool is None:
+            listings = None
+        else:
+            # List the tree level by level, each level's directories in parallel (jwalk-style)
+            listings = {}
+            level = [root]
+            while level:
+                results = list(self.walk_pool.map(self._list_dir, level)) if len(level) > 1 \
+                    else [self._list_dir(level[0])]
+                listings.update(zip(level, results))
+                level = [d for _, subdirs in results for d in subdirs]
+
+        # Emit in os.walk order (depth-first, files of a dir before its subdirs)
+        stack = [root]
+        while stack:
+            path = stack.pop()
+            files, subdirs = listings[path] if listings is not None else self._list_dir(path)
+            yield from files
+            stack.extend(reversed(subdirs))
+
+    def _list_dir(self, path: str) -> Tuple[List[os.DirEntry], List[str]]:
+        files, subdirs = [], []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    if not is_dir:
+                        files.append(entry)
+                    elif entry.name not in self.ignored_dirs and not entry.is_symlink():
+                        subdirs.append(entry.path)
+        except OSError:
+            pass  # Unreadable dir: os.walk silently skips these too
+        return files, subdirs
+
+    def _extract_batch(self, batch: List[os.DirEntry]) -> List[Tuple[str, Optional[str], bool]]:
+        results: Dict[int, Tuple[str, Optional[str], bool]] = {}
+        misses = []
+        
+        for i, entry in enumerate(batch):
+            st = self._stat(entry)
+            if self.cache is not None and st is not None:
+                hit, date_str = self.cache.get(entry.path, st.st_mtime, st.st_size)
+                if hit:
+                    results[i] = (entry.path, date_str, True)
+                    continue
+            misses.append((i, entry, st))
+
+        if misses:
+            paths = [e.path for _, e, _ in misses]
+            mtimes = [st.st_mtime if st else None for _, _, st in misses]
+            if self.pool is None: decoded = map(_extract_date, paths, mtimes)
+            else: decoded = self.pool.map(_extract_date, paths, mtimes, chunksize=DECODE_CHUNKSIZE)
+            
+            for (i, entry, st), res in zip(misses, decoded):
+                results[i] = res
+                if self.cache is not None and st is not None and res[2]:
+                    self.cache.put(entry.path, st.st_mtime, st.st_size, res[1])
+
+        return [results[i] for i in range(len(batch))]
+
+    def _stat(self, entry: os.DirEntry) -> Optional[os.stat_result]:
+        # Without a cache only videos need stat (mtime fallback); entry.stat() reuses the scandir cache
+        if self.cache is None and _file_ext(entry.name) not in VIDEO_EXT: return None
+        try: return entry.stat()
+        except OSError: return None
 
-    def _get_image_date(self, filepath: str) -> Optional[datetime]:
+    @staticmethod
+    def _get_date(filepath: str, mtime: Optional[float] = None) -> Optional[datetime]:
+        extractor = EXT_DISPATCH.get(os.path.splitext(filepath)[1].lower())
+        return extractor(filepath, mtime) if extractor else None
+
+    # Extractors share the (filepath, mtime) signature so EXT_DISPATCH can call any of them;
+    # only the video ones use mtime (fallback when the container has no date).
+    @staticmethod
+    def _get_jpeg_date(filepath: str, mtime: Optional[float] = None) -> Optional[datetime]:
+        try:
+            tiff = _read_jpeg_exif(filepath)
+            return MetadataScanner._parse_date(_find_tiff_date(tiff)) if tiff else None
+        except (ValueError, struct.error): pass  # Unusual layout: let Pillow try
+        return MetadataScanner._get_pillow_date(filepath)
+
+    @staticmethod
+    def _get_pillow_date(filepath: str, mtime: Optional[float] = None) -> Optional[datetime]:
         try:
+            # Metadata only: never call img.load(), pixels are not needed
             with Image.open(filepath) as img:
-                exif = img.getexif()
-                if not exif: return None
-                date_str = exif.get(36867) or exif.get(306)
-                return self._parse_date(date_str)
+                img.draft(img.mode, (1, 1))  # No-op except JPEG, where any decode is downscaled
+                if img.format == 'PNG':
+                    # PNG getexif() falls back to load() (full decode) when eXIf sits after IDAT
+                    raw = img.info.get('exif')
+                    if not raw: return None
+                    exif = Image.Exif()
+                    exif.load(raw)
+                else:
+                    exif = img.getexif()
+                return MetadataScanner._get_exif_date(exif)
+        except UnidentifiedImageError: return None  # Not a readable image: a stable answer
+        except OSError: raise  # I/O problem (permissions, NAS hiccup): may work next run
         except Exception: return None
 
-    def _get_video_date(self, filepath: str) -> Optional[datetime]:
-        if not HACHOIR_AVAILABLE: return None
+    @staticmethod
+    def _get_heic_date(filepath: str, mtime: Optional[float] = None) -> Optional[datetime]:
+        if not HEIF_AVAILABLE: raise MissingDependency("pillow-heif")
+        try:
+            # open_heif only parses the container; pixels are decoded lazily and never requested here
+            heif = pillow_heif.open_heif(filepath, convert_hdr_to_8bit=False)
+            raw = heif.info.get('exif')
+            if not raw: return None
+            exif = Image.Exif()
+            exif.load(raw)
+            return MetadataScanner._get_exif_date(exif)
+        except OSError: raise
+        except Exception: return None
+
+    @staticmethod
+    def _get_exif_date(exif: Image.Exif) -> Optional[datetime]:
+        if not exif: return None
+        # Same order as _find_tiff_date: DateTimeOriginal, then DateTime if it is missing or blank
+        return (MetadataScanner._parse_date(exif.get_ifd(TAG_EXIF_IFD).get(TAG_DATETIME_ORIGINAL))
+                or MetadataScanner._parse_date(exif.get(TAG_DATETIME)))
+
+    @staticmethod
+    def _get_mp4_date(filepath: str, mtime: Optional[float] = None) -> Optional[datetime]:
+        try:
+            dt = _read_mvhd_creation(filepath)
+            if dt and MIN_YEAR <= dt.year <= MAX_YEAR: return dt
+            return MetadataScanner._get_mtime_date(filepath, mtime)
+        except (ValueError, IndexError, struct.error, OverflowError): pass  # Unusual layout: let hachoir try
+        return MetadataScanner._get_hachoir_date(filepath, mtime)
+
+    @staticmethod
+    def _get_hachoir_date(filepath: str, mtime: Optional[float] = None) -> Optional[datetime]:
+        if not HACHOIR_AVAILABLE: raise MissingDependency("hachoir")
         try:
             parser = createParser(filepath)
             if parser:
@@ -131,8 +394,12 @@ class MetadataScanner:
         except Exception: pass
         
         # Fallback to mtime if hachoir fails
+        return MetadataScanner._get_mtime_date(filepath, mtime)
+
+    @staticmethod
+    def _get_mtime_date(filepath: str, mtime: Optional[float] = None) -> Optional[datetime]:
         try:
-            mtime = os.path.getmtime(filepath)
+            if mtime is None: mtime = os.path.getmtime(filepath)
             dt = datetime.fromtimestamp(mtime)
             if MIN_YEAR <= dt.year <= MAX_YEAR:
                 return dt
@@ -143,26 +410,100 @@ class MetadataScanner:
     def _parse_date(date_str: Any) -> Optional[datetime]:
         if not date_str: return None
         try:
-            s = str(date_str).strip().split('+')[0].split('Z')[0].replace('T', ' ')
-            date_part = s.split(' ')[0].replace('-', ':')
-            dt = datetime.strptime(date_part, "%Y:%m:%d")
+            # EXIF ("YYYY:MM:DD hh:mm:ss") and ISO ("YYYY-MM-DDThh:mm:ss+tz") both start with a
+            # fixed-width date, so slice it instead of going through strptime
+            s = str(date_str).strip()
+            if len(s) < 10 or s[4] not in ':-' or s[7] not in ':-': return None
+            y, mo, d = s[0:4], s[5:7], s[8:10]
+            if not (y.isdigit() and mo.isdigit() and d.isdigit()): return None
             
-            if MIN_YEAR <= dt.year <= MAX_YEAR:
-                return dt
+            year = int(y)
+            if MIN_YEAR <= year <= MAX_YEAR:
+                return datetime(year, int(mo), int(d))  # Still rejects month 13, Feb 30, ...
             else:
                 return None
                 
         except (ValueError, TypeError, IndexError): return None
 
+# Extension -> extractor, built once: one hashed lookup per file instead of chained membership tests
+EXT_DISPATCH: Dict[str, Callable[[str, Optional[float]], Optional[datetime]]] = {}
+EXT_DISPATCH.update({e: MetadataScanner._get_pillow_date for e in IMAGE_EXT})
+EXT_DISPATCH.update({e: MetadataScanner._get_jpeg_date for e in JPEG_EXT})
+EXT_DISPATCH.update({e: MetadataScanner._get_heic_date for e in HEIC_EXT})
+EXT_DISPATCH.update({e: MetadataScanner._get_hachoir_date for e in VIDEO_EXT})
+EXT_DISPATCH.update({e: MetadataScanner._get_mp4_date for e in ISOBMFF_EXT})
+
+def _extract_date(filepath: str, mtime: Optional[float] = None) -> Tuple[str, Optional[str], bool]:
+    """Pure worker entry point (module-level so ProcessPoolExecutor can pickle it).
+    Returns (path, date, cacheable): results caused by a missing library or an I/O error are not
+    cacheable, since the same file may yield a date on the next run."""
+    try:
+        date_obj = MetadataScanner._get_date(filepath, mtime)
+    except Exception:  # MissingDependency, OSError, or anything unexpected: never fatal for the folder
+        return filepath, None, False
+    return filepath, date_obj.strftime("%Y-%m-%d") if date_obj else None, True
+
+# ==========================================
+# MODULE 2: DATE CACHE
+# ==========================================
+class DateCache:
+    """Persistent (path, mtime, size) -> date cache so reruns skip decoding unchanged files."""
+
+    COMMIT_EVERY = 500
+    VERSION = 3  # Bump whenever extractor output changes; rows written by older versions are discarded
+
+    def __init__(self, db_path: str):
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] != self.VERSION:
+            self._conn.execute("DROP TABLE IF EXISTS cache")
+            self._conn.execute(f"PRAGMA user_version = {self.VERSION}")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS cache "
+                           "(path TEXT PRIMARY KEY, mtime REAL, size INTEGER, date TEXT)")
+        self._conn.commit()
+
+    def get(self, path: str, mtime: float, size: int) -> Tuple[bool, Optional[str]]:
+        """Returns (hit, date). A hit with date None means the file is known to have no usable date."""
+        try:
+            with self._lock:
+                row = self._conn.execute("SELECT date FROM cache WHERE path=? AND mtime=? AND size=?",
+                                         (path, mtime, size)).fetchone()
+        except sqlite3.Error as e:  # e.g. "database is locked" by another run: treat as a miss
+            logger.debug(f"Date cache read failed for {path}: {e}")
+            return False, None
+        if row is None: return False, None
+        return True, row[0]
+
+    def put(self, path: str, mtime: float, size: int, date_str: Optional[str]):
+        try:
+            with self._lock:
+                self._conn.execute("INSERT OR REPLACE INTO cache (path, mtime, size, date) VALUES (?, ?, ?, ?)",
+                                   (path, mtime, size, date_str))
+                self._pending += 1
+                if self._pending >= self.COMMIT_EVERY:
+                    self._conn.commit()
+                    self._pending = 0
+        except sqlite3.Error as e:
+            logger.debug(f"Date cache write failed for {path}: {e}")
+
+    def close(self):
+        with self._lock:
+            try:
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Date cache not saved: {e}")
+            self._conn.close()
+
 # ==========================================
-# MODULE 2: RENAME EXECUTOR
+# MODULE 3: RENAME EXECUTOR
 # ==========================================
 class RenameExecutor:
     def __init__(self):
         self._rename_lock = threading.Lock()
 
     def sanitize_name(self, name: str) -> str:
-        return re.sub(INVALID_FILENAME_CHARS, '', name).strip()
+        return _RE_INVALID_CHARS.sub('', name).strip()
 
     def get_unique_path(self, base_path: str) -> str:
         if not os.path.exists(base_path): return base_path
@@ -197,98 +538,147 @@ class RenameExecutor:
             return 'dry_run', os.path.basename(final_path)
 
 # ==========================================
-# MODULE 3: ORCHESTRATOR
+# MODULE 4: ORCHESTRATOR
 # ==========================================
+class FolderResult(NamedTuple):
+    """One row of the forensic report (a tuple, so no per-row dict)."""
+    status: str = 'skipped'
+    name: str = ''
+    reason: str = ''
+    new_name: str = ''
+    original_path: str = ''
+    full_new_path: str = ''
+
+class ReportStream:
+    """Writes the JSON report one result at a time (same layout as json.dump(..., indent=4))."""
+
+    def __init__(self, path: str, durable: bool = False):
+        self.path = path
+        self.durable = durable  # Flush every row (live runs: the report must survive a crash)
+        self._f = open(path, 'w', encoding='utf-8', buffering=-1 if durable else WRITE_BUFFER)
+        self._f.write('[')
+        self._count = 0
+
+    def write(self, row: FolderResult):
+        self._f.write(',\n' if self._count else '\n')
+        self._f.write(textwrap.indent(json.dumps(row._asdict(), indent=4, ensure_ascii=False), '    '))
+        self._count += 1
+        if self.durable: self._f.flush()
+
+    def close(self):
+        self._f.write('\n]' if self._count else ']')
+        self._f.close()
+
 class MediaFolderOrganizer:
     def __init__(self, args, file_prefix: str):
         self.target_path = os.path.abspath(args.path)
         self.live_run = args.live
         self.workers = args.workers
+        self.procs = args.procs
+        self.use_cache = not args.no_cache
         self.confidence = args.confidence
         self.case = args.case
+        self.force = args.force
         self.file_prefix = file_prefix
         
         self.ignored_dirs = DEFAULT_IGNORED_DIRS.union(set(args.ignore_dirs))
         self.ignored_ext = DEFAULT_IGNORED_EXT.union(set(args.ignore_ext))
         
-        self.scanner = MetadataScanner(self.ignored_dirs, DEFAULT_IGNORED_FILES, self.ignored_ext)
+        self.scanner = MetadataScanner(self.ignored_dirs, DEFAULT_IGNORED_FILES, self.ignored_ext,
+                                       min_confidence=self.confidence)
         self.executor = RenameExecutor()
 
     def _clean_base_name(self, name: str) -> str:
-        clean = re.sub(r"^[\d\.\-\/\s]+", "", name).strip()
+        clean = _RE_LEAD_NUM.sub("", name).strip()
         if not clean: return ""
         
         if self.case == 'upper': return clean.upper()
         if self.case == 'lower': return clean.lower()
         return clean.title()
 
-    def _process_folder(self, folder_path: str) -> Dict[str, Any]:
+    @staticmethod
+    def _is_already_renamed(name: str) -> bool:
+        # Cheap character check first; the regex only runs on names that look like "YYYY-MM-..."
+        return len(name) >= 10 and name[4] == '-' and name[7] == '-' and _RE_ISO_PREFIX.match(name) is not None
+
+    def _plan_folder(self, folder_path: str) -> FolderResult:
+        """Worker thread: scan + decide. Returns status 'planned' with the candidate name, or 'skipped'."""
         folder_name = os.path.basename(folder_path)
-        result = {'status': 'skipped', 'name': folder_name, 'reason': '', 'new_name': '', 'original_path': folder_path}
+        result = FolderResult(name=folder_name, original_path=folder_path)
+
+        # 0. Already organized on a previous run: no I/O at all unless --force
+        if not self.force and self._is_already_renamed(folder_name):
+            return result._replace(status='unchanged', new_name=folder_name, full_new_path=folder_path,
+                                   reason="Already renamed (use --force to rescan)")
 
         # 1. SCAN
         dates, total = self.scanner.scan_folder(folder_path)
         if not dates:
-            result['reason'] = "No valid dates found (Empty)"
-            return result
+            return result._replace(reason="No valid dates found (Empty)")
             
         # 2. DECIDE
         try:
             top_date_info = dates.most_common(1)
             if not top_date_info:
-                result['reason'] = "Date list empty"
-                return result
+                return result._replace(reason="Date list empty")
             top_date, count = top_date_info[0]
             if not top_date: 
-                result['reason'] = "Top date None"
-                return result
+                return result._replace(reason="Top date None")
         except IndexError:
-            result['reason'] = "Index Error"
-            return result
+            return result._replace(reason="Index Error")
 
         conf = count / total if total > 0 else 0
         if conf < self.confidence:
-            result['reason'] = f"Low confidence ({conf:.2f})"
-            return result
+            return result._replace(reason=f"Low confidence ({conf:.2f})")
 
         # 3. PLAN
         base_name = self._clean_base_name(folder_name)
-        new_name_candidate = f"{top_date} {base_name}".strip()
+        return result._replace(status='planned', new_name=f"{top_date} {base_name}".strip())
 
-        # 4. EXECUTE
-        status, final_name = self.executor.execute(folder_path, new_name_candidate, self.live_run)
-        
-        result['status'] = status
-        result['new_name'] = final_name
-        result['full_new_path'] = os.path.join(os.path.dirname(folder_path), final_name)
-        if status == 'error': result['reason'] = final_name
-        
-        return result
+    def _execute_plan(self, result: FolderResult) -> FolderResult:
+        """Main thread: renames (or simulates) a planned folder."""
+        if result.status != 'planned': return result
+        folder_path = result.original_path
 
-    def generate_reports(self, results: List[Dict]):
-        """Generates JSON Report and Bash/PS1 Undo Scripts"""
+        # 4. EXECUTE
+        status, final_name = self.executor.execute(folder_path, result.new_name, self.live_run)
         
-        # 1. JSON Report
-        json_path = f"{self.file_prefix}_report.json"
+        return result._replace(status=status, new_name=final_name,
+                               full_new_path=os.path.join(os.path.dirname(folder_path), final_name),
+                               reason=final_name if status == 'error' else result.reason)
+
+    def _iter_completed(self, pool: Executor, fn: Callable[[str], FolderResult],
+                        folders: List[str]) -> Iterator[Future]:
+        """Yields futures as they finish while keeping at most 2x workers folders in flight,
+        so scans of later folders overlap the main thread's rename/report work."""
+        folder_iter = iter(folders)
+        pending = {pool.submit(fn, f) for f in islice(folder_iter, self.workers * 2)}  # type: ignore[arg-type]
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            pending.update(pool.submit(fn, f) for f in islice(folder_iter, len(done)))  # type: ignore[arg-type]
+            yield from done
+
+    def open_report(self) -> Optional[ReportStream]:
+        """Opens the streaming JSON Report (rows are written as folders finish)"""
         try:
-            with open(json_path, 'w', encoding='utf-8') as f:
-                json.dump(results, f, indent=4, ensure_ascii=False)
-            logger.info(f"📄 Forensic Report saved to: {json_path}")
+            return ReportStream(f"{self.file_prefix}_report.json", durable=self.live_run)
         except Exception as e:
             logger.error(f"Failed to save JSON report: {e}")
+            return None
 
-        renamed_items = [r for r in results if r['status'] == 'renamed']
+    def generate_reports(self, renamed_items: List[FolderResult]):
+        """Generates Bash/PS1 Undo Scripts"""
         if not renamed_items: return
 
-        # 2. Bash Undo Script
+        # 1. Bash Undo Script
         undo_path = f"{self.file_prefix}_undo.sh"
         try:
-            with open(undo_path, 'w', encoding='utf-8') as f:
+            with open(undo_path, 'w', encoding='utf-8', buffering=WRITE_BUFFER) as f:
                 f.write("#!/bin/bash\n")
                 f.write(f"# Undo Script for target: {self.target_path}\n\n")
                 for item in renamed_items:
-                    old = item['original_path'].replace('"', '\\"')
-                    new = item['full_new_path'].replace('"', '\\"')
+                    old = item.original_path.replace('"', '\\"')
+                    new = item.full_new_path.replace('"', '\\"')
                     f.write(f'mv "{new}" "{old}"\n')
             
             os.chmod(undo_path, 0o755)
@@ -296,14 +686,14 @@ class MediaFolderOrganizer:
         except Exception as e:
             logger.error(f"Failed to save Undo script: {e}")
 
-        # 3. PowerShell Undo Script
+        # 2. PowerShell Undo Script
         undo_ps1 = f"{self.file_prefix}_undo.ps1"
         try:
-            with open(undo_ps1, 'w', encoding='utf-8') as f:
+            with open(undo_ps1, 'w', encoding='utf-8', buffering=WRITE_BUFFER) as f:
                 f.write("# PowerShell Undo Script\n\n")
                 for item in renamed_items:
-                    old = item['original_path'].replace("'", "''")
-                    new = item['full_new_path'].replace("'", "''")
+                    old = item.original_path.replace("'", "''")
+                    new = item.full_new_path.replace("'", "''")
                     f.write(f"Move-Item -Path '{new}' -Destination '{old}' -Force\n")
             logger.info(f"↩️  PowerShell Undo saved to: {undo_ps1}")
         except Exception as e:
@@ -314,7 +704,7 @@ class MediaFolderOrganizer:
         print("SYSTEM CHECK (V35 Final)")
         print("="*40)
         if HACHOIR_AVAILABLE: print("✅ [OK] hachoir (Video)")
-        else: print("⚠️  [WARNING] 'hachoir' missing. Videos skipped.")
+        else: print("⚠️  [WARNING] 'hachoir' missing. AVI/MKV skipped.")
         if HEIF_AVAILABLE: print("✅ [OK] pillow-heif (HEIC)")
         else: print("⚠️  [WARNING] 'pillow-heif' missing. HEIC skipped.")
         print("="*40 + "\n")
@@ -326,35 +716,75 @@ class MediaFolderOrganizer:
                          and os.path.basename(f.path) not in self.ignored_dirs])
         
         stats = Counter()
-        skipped_details = []
-        all_results = []
-
-        def _submit_folder(path: str) -> Dict[str, Any]:
-            return self._process_folder(path)
+        skipped_details = []  # First few only, for the console summary
+        renamed_items = []    # Only rows the undo scripts need stay in memory
+        report = self.open_report()
+
+        def _submit_folder(path: str) -> FolderResult:
+            return self._plan_folder(path)
+
+        # Decode files in separate processes to get past the GIL. 'spawn' because forking a
+        # parent that is already running worker threads is unsafe.
+        decode_pool = None
+        if self.procs > 0:
+            decode_pool = ProcessPoolExecutor(max_workers=self.procs,
+                                              mp_context=multiprocessing.get_context("spawn"))
+        self.scanner.pool = decode_pool
+
+        cache = None
+        if self.use_cache:
+            try:
+                cache = DateCache(f"{self.file_prefix}_cache.sqlite")
+            except sqlite3.Error as e:
+                logger.warning(f"Date cache disabled: {e}")
+        self.scanner.cache = cache
+
+        # Second level of parallelism: subdirectories inside each folder are listed concurrently
+        walk_pool = ThreadPoolExecutor(max_workers=self.workers)
+        self.scanner.walk_pool = walk_pool
 
         with ThreadPoolExecutor(max_workers=self.workers) as pool:
-            futures = {pool.submit(_submit_folder, f): f for f in subdirs}  # type: ignore[arg-type]
+            futures = self._iter_completed(pool, _submit_folder, subdirs)
             
-            for fut in tqdm(as_completed(futures), total=len(subdirs), unit="dir"):
+            for fut in tqdm(futures, total=len(subdirs), unit="dir"):
                 try:
-                    res = fut.result()
-                    all_results.append(res)
-                    stats[res['status']] += 1
+                    res = self._execute_plan(fut.result())
+                    stats[res.status] += 1
                     
-                    if res['status'] == 'renamed':
-                        logger.info(f"✅ {res['name']} -> {res['new_name']}")
-                    elif res['status'] == 'dry_run':
-                        logger.info(f"🔮 {res['name']} -> {res['new_name']}")
-                    elif res['status'] == 'error':
-                        logger.error(f"❌ {res['name']}: {res['reason']}")
-                    elif res['status'] == 'skipped':
-                        skipped_details.append(f"{res['name']} ({res['reason']})")
+                    if res.status == 'renamed':
+                        renamed_items.append(res)
+                        logger.info(f"✅ {res.name} -> {res.new_name}")
+                    elif res.status == 'dry_run':
+                        logger.info(f"🔮 {res.name} -> {res.new_name}")
+                    elif res.status == 'error':
+                        logger.error(f"❌ {res.name}: {res.reason}")
+                    elif res.status == 'skipped' and len(skipped_details) < 5:
+                        skipped_details.append(f"{res.name} ({res.reason})")
                         
                 except Exception as e:
                     logger.critical(f"Worker Crash: {e}")
                     stats['crash'] += 1
-
-        self.generate_reports(all_results)
+                    continue
+
+                # Report last and on its own: a failed write (e.g. full volume) must not drop the
+                # result from the undo scripts or count as a crash
+                if report:
+                    try:
+                        report.write(res)
+                    except Exception as e:
+                        logger.error(f"Failed to write report row for {res.name}: {e}")
+
+        walk_pool.shutdown()
+        if decode_pool: decode_pool.shutdown()
+        if cache: cache.close()
+        if report:
+            try:
+                report.close()
+                logger.info(f"📄 Forensic Report saved to: {report.path}")
+            except Exception as e:
+                logger.error(f"Failed to save JSON report: {e}")
+
+        self.generate_reports(renamed_items)
 
         print("\n" + "="*40)
         print("          FINAL REPORT")
@@ -379,7 +809,7 @@ class MediaFolderOrganizer:
                 if count >= 5: break
                 print(f" • {s}")
                 count += 1
-            if len(skipped_details) > 5: print(f"   ... and {len(skipped_details)-5} more (see json).")
+            if stats['skipped'] > 5: print(f"   ... and {stats['skipped']-5} more (see json).")
         print("="*40 + "\n")
 
 def main():
@@ -390,10 +820,15 @@ def main():
     # Auto-detect CPU threads (Conservative: CPU / 2)
     default_workers = max(1, (os.cpu_count() or 4) // 2)
     parser.add_argument("--workers", type=int, default=default_workers, help=f"Default: {default_workers} (Auto: CPU/2)")
+    # Opt-in: direct JPEG/MP4 parsing is cheaper in-thread than a round-trip to a spawned process
+    parser.add_argument("--procs", type=int, default=0,
+                        help="Decode processes. Default: 0 (decode inside worker threads)")
     
     parser.add_argument("--confidence", type=float, default=0.6)
     parser.add_argument("--case", default='upper', choices=['title', 'upper', 'lower'])
     parser.add_argument("--debug", action="store_true", help="Enable verbose logs")
+    parser.add_argument("--force", action="store_true", help="Rescan folders already named 'YYYY-MM-DD ...'")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read/write the date cache (<prefix>_cache.sqlite)")
     parser.add_argument("--ignore-dirs", nargs='+', default=[], help="Add dirs to ignore")
     parser.add_argument("--ignore-ext", nargs='+', default=[], help="Add extensions to ignore")
 
@@ -412,8 +847,16 @@ def main():
 
     # Setup Logging
     lvl = logging.DEBUG if args.debug else logging.INFO
-    logging.basicConfig(filename=log_filename, filemode='w', level=lvl,
-                        format="%(asctime)s - %(levelname)s - %(message)s")
+    file_handler = logging.FileHandler(log_filename, mode='w')
+    file_handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+    if args.live:
+        # Live: every "✅ old -> new" line hits the disk as it happens, so the rename trail survives a crash
+        handler: logging.Handler = file_handler
+    else:
+        # Dry run: batch log writes (timestamps are taken per record); ERROR+ flushes at once,
+        # the rest is flushed by logging.shutdown() at exit
+        handler = logging.handlers.MemoryHandler(capacity=1000, flushLevel=logging.ERROR, target=file_handler)
+    logging.basicConfig(level=lvl, handlers=[handler])
     
     console = logging.StreamHandler()
     console.setLevel(logging.WARNING) 
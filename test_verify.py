@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""Regression tests for exif-parallel-organizer.py. Run: python test_verify.py -v"""
+
+import os
+import random
+import struct
+import tempfile
+import unittest
+import importlib.util
+from datetime import datetime
+from types import SimpleNamespace
+
+# The script name has hyphens, so it cannot be imported with a plain `import`
+_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "exif-parallel-organizer.py")
+_spec = importlib.util.spec_from_file_location("organizer", _SCRIPT)
+organizer = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(organizer)
+
+MetadataScanner = organizer.MetadataScanner
+RenameExecutor = organizer.RenameExecutor
+
+from PIL import Image
+
+
+def make_tiff(byteorder: bytes, date_time=None, original=None) -> bytes:
+    """Builds a minimal TIFF block: IFD0 (DateTime + Exif pointer) and an Exif sub-IFD (DateTimeOriginal)."""
+    e = '<' if byteorder == b'II' else '>'
+    ifd0 = [(organizer.TAG_DATETIME, date_time)] if date_time is not None else []
+    exif = [(organizer.TAG_DATETIME_ORIGINAL, original)] if original is not None else []
+
+    n0 = len(ifd0) + (1 if exif else 0)
+    exif_off = 8 + 2 + 12 * n0 + 4
+    data_off = exif_off + (2 + 12 * len(exif) + 4 if exif else 0)
+    data = b''
+
+    def entries(tags):
+        nonlocal data
+        out = b''
+        for tag, text in tags:
+            raw = text.encode('ascii') + b'\x00'
+            if len(raw) <= 4:
+                value = raw.ljust(4, b'\x00')
+            else:  # Stored out of line, after both IFDs
+                value = struct.pack(e + 'I', data_off + len(data))
+                data += raw
+            out += struct.pack(e + 'HHI', tag, 2, len(raw)) + value
+        return out
+
+    body0 = entries(ifd0)
+    if exif: body0 += struct.pack(e + 'HHII', organizer.TAG_EXIF_IFD, 4, 1, exif_off)
+    block = byteorder + struct.pack(e + 'HI', 42, 8) + struct.pack(e + 'H', n0) + body0 + b'\x00' * 4
+    if exif: block += struct.pack(e + 'H', len(exif)) + entries(exif) + b'\x00' * 4
+    return block + data
+
+
+def box(typ: bytes, payload: bytes = b'') -> bytes:
+    return struct.pack('>I4s', 8 + len(payload), typ) + payload
+
+
+def mvhd(seconds: int, version: int = 0) -> bytes:
+    if version == 1: times = struct.pack('>QQIQ', seconds, seconds, 1000, 0)
+    else: times = struct.pack('>IIII', seconds, seconds, 1000, 0)
+    return box(b'mvhd', bytes([version, 0, 0, 0]) + times + b'\x00' * 80)
+
+
+def make_jpeg(tiff: bytes) -> bytes:
+    app1 = b'Exif\x00\x00' + tiff
+    return b'\xff\xd8' + b'\xff\xe1' + struct.pack('>H', len(app1) + 2) + app1 + b'\xff\xda\x00\x02' + b'\xff\xd9'
+
+
+class TestParseDate(unittest.TestCase):
+    def test_exif_and_iso(self):
+        self.assertEqual(MetadataScanner._parse_date("2019:01:02 10:00:00"), datetime(2019, 1, 2))
+        self.assertEqual(MetadataScanner._parse_date("2019-01-02T10:00:00+08:00"), datetime(2019, 1, 2))
+        self.assertEqual(MetadataScanner._parse_date("  2019:01:02 10:00:00\x00 "), datetime(2019, 1, 2))
+        self.assertEqual(MetadataScanner._parse_date(datetime(2019, 1, 2, 10)), datetime(2019, 1, 2))
+
+    def test_empty_and_blank(self):
+        for value in (None, "", "    :  :     ", "    :  :   00:00:00", "0000:00:00 00:00:00"):
+            self.assertIsNone(MetadataScanner._parse_date(value), value)
+
+    def test_bad_shapes(self):
+        for value in ("2019:01", "2019/01/02", "19:01:02 10:00", "2019:1:2 10:00:00", "abcd:ef:gh", b"2019:01:02"):
+            self.assertIsNone(MetadataScanner._parse_date(value), value)
+
+    def test_invalid_calendar_dates(self):
+        for value in ("2019:13:01", "2019:02:30", "2019:00:10", "2019:01:00"):
+            self.assertIsNone(MetadataScanner._parse_date(value), value)
+
+    def test_year_sanity_bounds(self):
+        self.assertIsNone(MetadataScanner._parse_date(f"{organizer.MIN_YEAR - 1}:12:31"))
+        self.assertIsNotNone(MetadataScanner._parse_date(f"{organizer.MIN_YEAR}:01:01"))
+        self.assertIsNotNone(MetadataScanner._parse_date(f"{organizer.MAX_YEAR}:12:31"))
+        self.assertIsNone(MetadataScanner._parse_date(f"{organizer.MAX_YEAR + 1}:01:01"))
+
+
+class TestSanitizeName(unittest.TestCase):
+    def test_strips_invalid_chars(self):
+        executor = RenameExecutor()
+        self.assertEqual(executor.sanitize_name('2019-01-02 A<B>:C"D/E\\F|G?H*'), "2019-01-02 ABCDEFGH")
+        self.assertEqual(executor.sanitize_name("  2019-01-02 TRIP  "), "2019-01-02 TRIP")
+
+
+class TestTiffDate(unittest.TestCase):
+    DTO = "2018:05:06 07:08:09"
+    DT = "2019:01:02 10:00:00"
+
+    def test_both_byte_orders(self):
+        for order in (b'II', b'MM'):
+            self.assertEqual(organizer._find_tiff_date(make_tiff(order, self.DT, self.DTO)), self.DTO)
+            self.assertEqual(organizer._find_tiff_date(make_tiff(order, date_time=self.DT)), self.DT)
+            self.assertEqual(organizer._find_tiff_date(make_tiff(order, original=self.DTO)), self.DTO)
+            self.assertIsNone(organizer._find_tiff_date(make_tiff(order)))
+
+    def test_blank_original_falls_back_to_datetime(self):
+        for order in (b'II', b'MM'):
+            for original in ("", "    :  :     ", "    :  :   00:00:00", "garbage"):
+                self.assertEqual(organizer._find_tiff_date(make_tiff(order, self.DT, original)), self.DT, original)
+
+    def test_bad_byte_order(self):
+        with self.assertRaises(ValueError):
+            organizer._find_tiff_date(b'XX' + make_tiff(b'II')[2:])
+
+    def test_jpeg_marker_walk(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "a.jpg")
+            with open(path, 'wb') as f: f.write(make_jpeg(make_tiff(b'MM', self.DT, "    :  :     ")))
+            self.assertEqual(MetadataScanner._get_jpeg_date(path), datetime(2019, 1, 2))
+
+            with open(path, 'wb') as f: f.write(b'\xff\xd8\xff\xda\x00\x02\xff\xd9')  # No APP1 at all
+            self.assertIsNone(organizer._read_jpeg_exif(path))
+
+    def test_direct_and_pillow_paths_agree(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "a.jpg")
+            for original in (None, self.DTO, "", "    :  :     "):
+                exif = Image.Exif()
+                exif[organizer.TAG_DATETIME] = self.DT
+                if original is not None: exif.get_ifd(organizer.TAG_EXIF_IFD)[organizer.TAG_DATETIME_ORIGINAL] = original
+                Image.new('RGB', (8, 8)).save(path, exif=exif)
+                self.assertEqual(MetadataScanner._get_jpeg_date(path), MetadataScanner._get_pillow_date(path), original)
+
+
+class TestMvhd(unittest.TestCase):
+    WHEN = datetime(2019, 1, 2, 10, 0, 0)
+    SECONDS = int((WHEN - organizer.MP4_EPOCH).total_seconds())
+    FTYP = box(b'ftyp', b'isom\x00\x00\x02\x00isomiso2')
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self._tmp.name, "clip.mp4")
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def read(self, data: bytes):
+        with open(self.path, 'wb') as f: f.write(data)
+        return organizer._read_mvhd_creation(self.path)
+
+    def test_versions(self):
+        self.assertEqual(self.read(self.FTYP + box(b'moov', mvhd(self.SECONDS, 0))), self.WHEN)
+        self.assertEqual(self.read(self.FTYP + box(b'moov', mvhd(self.SECONDS, 1))), self.WHEN)
+
+    def test_unset_creation_time(self):
+        self.assertIsNone(self.read(self.FTYP + box(b'moov', mvhd(0))))
+
+    def test_skips_boxes_before_moov(self):
+        mdat = box(b'mdat', b'\x00' * 1000)
+        free_large = struct.pack('>I4sQ', 1, b'free', 16 + 32) + b'\x00' * 32  # 64-bit largesize
+        moov = box(b'moov', box(b'udta', b'\x00' * 12) + mvhd(self.SECONDS))
+        self.assertEqual(self.read(self.FTYP + mdat + free_large + moov), self.WHEN)
+
+    def test_size_zero_box_runs_to_end(self):
+        moov = struct.pack('>I4s', 0, b'moov') + mvhd(self.SECONDS)
+        self.assertEqual(self.read(self.FTYP + moov), self.WHEN)
+
+    def test_largesize_moov(self):
+        inner = mvhd(self.SECONDS)
+        moov = struct.pack('>I4sQ', 1, b'moov', 16 + len(inner)) + inner
+        self.assertEqual(self.read(self.FTYP + moov), self.WHEN)
+
+    def test_missing_and_bad_boxes(self):
+        for data in (self.FTYP + box(b'mdat', b'\x00' * 8),  # No moov
+                     self.FTYP + box(b'moov', box(b'trak')),  # moov without mvhd
+                     self.FTYP + struct.pack('>I4s', 4, b'free')):  # Size smaller than its header
+            with self.assertRaises(ValueError):
+                self.read(data)
+
+    def test_truncated(self):
+        full = self.FTYP + box(b'moov', mvhd(self.SECONDS, 1))
+        cuts = [len(self.FTYP) + 8 + 8 + n for n in (0, 2, 4, 6)]  # Inside the mvhd version/flags/time fields
+        for cut in cuts:
+            with self.assertRaises(ValueError, msg=cut):
+                self.read(full[:cut])
+        with self.assertRaises(ValueError):  # largesize announced but cut off
+            self.read(self.FTYP + struct.pack('>I4s', 1, b'free') + b'\x00' * 4)
+
+    @unittest.skipUnless(organizer.HACHOIR_AVAILABLE, "hachoir not installed")
+    def test_truncated_falls_back_to_mtime(self):
+        with open(self.path, 'wb') as f: f.write(self.FTYP + box(b'moov', mvhd(self.SECONDS))[:16])  # Ends right after the mvhd header
+        mtime = datetime(2020, 5, 6, 12, 0, 0).timestamp()
+        self.assertEqual(MetadataScanner._get_mp4_date(self.path, mtime), datetime(2020, 5, 6, 12, 0, 0))
+
+    def test_out_of_range_uses_mtime(self):
+        with open(self.path, 'wb') as f: f.write(self.FTYP + box(b'moov', mvhd(3600)))  # 1904
+        mtime = datetime(2020, 5, 6, 12, 0, 0).timestamp()
+        self.assertEqual(MetadataScanner._get_mp4_date(self.path, mtime), datetime(2020, 5, 6, 12, 0, 0))
+
+
+class FakeScanner(MetadataScanner):
+    """Scanner over an in-memory folder: a list of per-file dates (None = no usable date)."""
+
+    def __init__(self, dates, min_confidence, early_stop=True):
+        super().__init__(set(), set(), set(), min_confidence=min_confidence)
+        self.dates = dates
+        self.early_stop = early_stop
+
+    def _scan(self, root):
+        return (SimpleNamespace(name=f"{i}.jpg", path=str(i)) for i in range(len(self.dates)))
+
+    def _extract_batch(self, batch):
+        return [(e.path, self.dates[int(e.path)], True) for e in batch]
+
+    def _is_decided(self, *args):
+        return self.early_stop and super()._is_decided(*args)
+
+
+def verdict(dates, total, min_confidence):
+    """Mirrors the DECIDE step of MediaFolderOrganizer._plan_folder."""
+    if not dates: return "empty"
+    top_date, count = dates.most_common(1)[0]
+    return top_date if count / total >= min_confidence else "low"
+
+
+class TestEarlyStop(unittest.TestCase):
+    def check(self, dates, min_confidence):
+        early = FakeScanner(dates, min_confidence).scan_folder("x")
+        full = FakeScanner(dates, min_confidence, early_stop=False).scan_folder("x")
+        self.assertEqual(verdict(*early, min_confidence), verdict(*full, min_confidence),
+                         f"{dates} @ {min_confidence}")
+        self.assertLessEqual(early[1], full[1])
+
+    def test_dateless_files_first(self):
+        # Hopeless exit must not fire before any date is seen: full scan says "Low confidence", not "Empty"
+        dates = [None] * 16 + ["2019-01-02"] * 20
+        self.check(dates, 0.6)
+        self.assertEqual(verdict(*FakeScanner(dates, 0.6).scan_folder("x"), 0.6), "low")
+
+    def test_all_dateless(self):
+        self.check([None] * 40, 0.6)
+
+    def test_matches_full_scan(self):
+        rng = random.Random(1234)
+        pool = ["2019-01-02", "2019-01-03", "2020-07-01", None]
+        for _ in range(3000):
+            weights = [rng.random() for _ in pool]
+            dates = rng.choices(pool, weights, k=rng.randint(0, 150))
+            self.check(dates, rng.choice([0.0, 0.3, 0.5, 0.6, 0.8, 1.0]))
+
+
+if __name__ == "__main__":
+    unittest.main()